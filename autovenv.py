@@ -49,7 +49,6 @@ if (
 
 else:
 
-    import inspect
     import shutil
     import subprocess
     import venv
@@ -68,24 +67,23 @@ else:
         os.environ["AUTOVENV_IS_RUNNING"] = __version__
 
         # Find the __main__ module which called this function and look for
-        # or create a virtualenv in that module's containing directory
-        caller = [
-            f[1] for f in inspect.stack() if f[0].f_locals.get("__name__") == "__main__"
-        ][0]
+        # or create a virtualenv in that module's containing directory. The
+        # frames are walked directly since inspect.stack() reads source files
+        frame = sys._getframe(1)
+        while frame.f_globals.get("__name__") != "__main__":
+            frame = frame.f_back
+        caller = frame.f_code.co_filename
         calling_script = os.path.realpath(caller)
         calling_script_dir = os.path.dirname(calling_script)
         venv_dir = os.path.join(calling_script_dir, venv_name)
         venv_python = os.path.join(venv_dir, "bin", "python")
 
-        # Show the disclaimer
-        log(
-            "*",
-            "Autovenv is bootstrapping a virtual environment using "
-            + requirements_file,
-            "\n      --no-autovenv      Don't auto activate or install a virtualenv",
-            "\n      --remove-venv      Remove old virtualenv so a fresh one can be installed",
-            "\n",
-        )
+        # Do nothing if this interpreter is already running within the virtualenv
+        if not flags["--remove-venv"] and os.path.realpath(
+            sys.prefix
+        ) == os.path.realpath(venv_dir):
+            return
+
         log(
             "+",
             "Running",
@@ -101,6 +99,15 @@ else:
 
         # Handle the case of the nonexistant virtualenv by creating it
         if not os.path.isfile(venv_python):
+            # Show the disclaimer
+            log(
+                "*",
+                "Autovenv is bootstrapping a virtual environment using "
+                + requirements_file,
+                "\n      --no-autovenv      Don't auto activate or install a virtualenv",
+                "\n      --remove-venv      Remove old virtualenv so a fresh one can be installed",
+                "\n",
+            )
             log("i", "No virtualenv found")
 
             # Run with working directory of the calling script
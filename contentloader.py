@@ -1,15 +1,18 @@
 # fmt: off
 
 import argparse
+import collections
 import concurrent.futures
+import functools
+import itertools
 import json
 import math
+import multiprocessing
 import os
 import re
 import shlex
 import sys
 import time
-from copy import deepcopy
 from datetime import datetime
 from dateutil import parser
 from hashlib import md5
@@ -19,10 +22,13 @@ from urllib.parse import urljoin
 import couchdb
 import driveclient
 import jinja2
-import ftlangdetect
+import orjson
 import requests
-from fuzzywuzzy.process import extractOne
+from ftlangdetect.detect import get_or_load_model as load_language_model
 from icu import ListFormatter, Locale
+from rapidfuzz.fuzz import WRatio
+from rapidfuzz.process import cdist, extractOne
+from rapidfuzz.utils import default_process
 
 # Kludge to fix broken google-api-python-client
 from oauth2client import file
@@ -33,6 +39,35 @@ from config import *
 
 
 NEW = '_new_content'
+DB_SAVE_CHUNK_SIZE = 500
+DB_SAVE_WORKERS = 4
+PARSE_WORKERS = os.cpu_count() or 1
+PARSE_CHUNK_SIZE = 16
+PARSE_POOL_THRESHOLD = 2 * PARSE_CHUNK_SIZE
+
+# There are about 12 more dashes in unicode, but we'll support these
+# five for key-whatever modules and call it a day. This regex handles
+# incorrect spacing around the hyphens, Arabic hyphens and more!
+KEY_PATTERN = r'(?P<module>.+?)(?:{}[][)(]*[-—–―ـ]\s+|\s+[-—–―ـ]\s+)(?P<description>.+)'
+KEY_REGEX = re.compile(KEY_PATTERN.format(ARABIC_BOUNDARY_REGEX), re.DOTALL)
+
+# This regex isn't pefect, but should work for 99% of our cases. The
+# problem relates to detecting nested parens without a proper parser.
+# This solution just swallows any ending with an extra close paren.
+# Since the link text is fuzzy matched anyway, we don't need to reliably
+# capture the full link text. However, if any module names end up with
+# parens in their middles "Like (such as) this", this method will fail.
+XREF_REGEX = re.compile(r'(?<!!)\[([^\]]*)\]\(((?!http)[^)]+)\)(?:\s*\))?')
+
+MULTILINE_REGEX = re.compile(r'\s*\n\s*\n\s*')
+SNAPSHOT_REGEX = re.compile('SNAPSHOT')
+GALLERY_REGEX = re.compile('GALLERY')
+EXAMPLE_FULL_WRITE_UP_REGEX = re.compile(r'In a page \(500 words\) or less')
+RWE_IMAGE_REGEX = re.compile('rwe_[a-f0-9]{32}_')
+
+# Emails and 3-character-suffixed filenames, once a string is known to have no whitespace
+WHITESPACE_REGEX = re.compile(r'\s')
+COMPUTER_THING_SUFFIX_REGEX = re.compile(r'.(?:\.[a-z]{3}|@\S+)$')
 
 
 class ContentLoader(object):
@@ -83,13 +118,18 @@ class ContentLoader(object):
         # Site previews to be generated last
         self.preview_queue = {}
 
+        # Fuzzy matching results (cleared by each phase which uses them) and renames already logged
+        self.fuzzy_match_cache = {}
+        self.title_view_cache = {}
+        self.rename_cache = set()
+
         # Download assets
         if self.options.assets:
             self.download_assets(force_conversion=True)
 
         # Generate fresh site previews
         elif self.options.regenerate_previews:
-            all_content = [d.doc for d in self.db.view('_all_docs', include_docs=True) if 'document_id' in d.doc]
+            all_content = [doc for doc in self.db_all_docs() if 'document_id' in doc]
             for content in all_content:
                 self.enqueue_previews_and_update_rwes(content)
             self.generate_previews()
@@ -97,7 +137,7 @@ class ContentLoader(object):
 
         # Test fuzzy matcher against existing content
         elif self.options.test_match:
-            all_slugs = [d.doc['slug'] for d in self.db.view('_all_docs', include_docs=True)]
+            all_slugs = [doc['slug'] for doc in self.db_all_docs() if 'slug' in doc]
             match = self.find_fuzzy(self.options.test_match, all_slugs, 90)
             if match:
                 log('fuzzy: Found match "{}" for string "{}"'.format(match, self.options.test_match))
@@ -124,17 +164,17 @@ class ContentLoader(object):
             #TODO: handle document renaming/deletion
 
             if self.options.local:
-                with script_directory():
-                    try:
-                        with open(DRIVE_CACHE_FILE_NAME) as f:
-                            log('local: loading local cache of drive content')
-                            published_documents = json.load(f, object_hook=driveclient_document_json_decoder)
-                    except FileNotFoundError:
-                        die(f"local: can't find local cache {DRIVE_CACHE_FILE_NAME}")
+                with script_directory() as directory:
+                    cache_file_name = os.path.join(directory, DRIVE_CACHE_FILE_NAME)
+                if not os.path.isfile(cache_file_name):
+                    die(f"local: can't find local cache {DRIVE_CACHE_FILE_NAME}")
+                # Documents are decoded one at a time as they're needed
+                log('local: loading local cache of drive content')
+                published_documents = driveclient_document_json_stream(cache_file_name)
 
             else:
                 # Identify published documents by their filenames and fetch new content
-                published = re.compile(self.config['published-filename-regex']).search
+                published = self.published_regex.search
                 published_documents = [d for d in self.get_documents() if published(d.title) or d.id in self.options.ids]
 
                 # Eagerly download in multiple threads (segfaults!)
@@ -148,16 +188,29 @@ class ContentLoader(object):
                             json.dump(published_documents, f, indent=2, default=driveclient_document_json_encoder)
                             log('local: saved local cache of drive content', fatal=True)
 
-            if not published_documents:
+            # Peek at the first document since published_documents may be a stream
+            published_documents = iter(published_documents)
+            first_document = next(published_documents, None)
+            if first_document is None:
                 warn('skip: no documents to load', fatal=True)
-            new_content = filter(None, map(self.extract_and_transform, published_documents))
+            published_documents = itertools.chain([first_document], published_documents)
+
+            # Text is fetched here, then parsing happens in worker processes using detached documents
+            transform = functools.partial(self.extract_and_transform, self.config, self.plural_separator_regex)
+            detached_documents = ({**d.attributes, '__text': d.text} for d in published_documents)
+            first_documents = list(itertools.islice(detached_documents, PARSE_POOL_THRESHOLD))
+            if len(first_documents) < PARSE_POOL_THRESHOLD:
+                # Too few documents (e.g. a notification run) to be worth starting worker processes
+                new_content = list(filter(None, map(transform, first_documents)))
+            else:
+                new_content = list(filter(None, self.transform_in_processes(
+                    transform, itertools.chain(first_documents, detached_documents))))
 
             # A full reload is triggered when no ids or changes are specified
             full_reload = not (self.options.ids or self.options.changes)
             if not full_reload:
                 log('db: preserving existing content')
-                existing_content = {d.doc['document_id']: d.doc for d in
-                    self.db.view('_all_docs', include_docs=True) if 'document_id' in d.doc}
+                existing_content = {doc['document_id']: doc for doc in self.db_all_docs() if 'document_id' in doc}
             else:
                 log('db: not preserving existing content')
                 existing_content = {}
@@ -175,8 +228,8 @@ class ContentLoader(object):
 
             all_content = self.pre_filters(all_content)
 
-            all_content = self.merge_translations(all_content)
-            all_content = self.fix_relationships(all_content)
+            all_content, typed_content, typed_slugged_content = self.merge_translations(all_content)
+            all_content = self.fix_relationships(all_content, typed_content, typed_slugged_content)
 
             all_content = self.post_filters(all_content)
 
@@ -206,15 +259,11 @@ class ContentLoader(object):
         '''
         log('filters: preprocessing unmerged docs')
 
-        # There are about 12 more dashes in unicode, but we'll support these
-        # five for key-whatever modules and call it a day. This regex handles
-        # incorrect spacing around the hyphens, Arabic hyphens and more!
-        key_pattern = r'(?P<module>.+?)(?:{}[][)(]*[-—–―ـ]\s+|\s+[-—–―ـ]\s+)(?P<description>.+)'
-        key_finder = re.compile(key_pattern.format(ARABIC_BOUNDARY_REGEX), re.DOTALL).findall
+        key_finder = KEY_REGEX.findall
 
         language_default = self.config['language-default']
 
-        module_types = [t['one'] for t in self.config['types-tool']]
+        module_types = frozenset(t['one'] for t in self.config['types-tool'])
         module_types_plural = [t['many'] for t in self.config['types-tool']]
 
         for content in all_content:
@@ -226,9 +275,9 @@ class ContentLoader(object):
                 # Add a module-type
                 if content['type'] in module_types:
                     content['module-type'] = 'full'
-                    if re.search('SNAPSHOT', content['document_title']):
+                    if SNAPSHOT_REGEX.search(content['document_title']):
                         content['module-type'] = 'snapshot'
-                    elif re.search('GALLERY', content['document_title']):
+                    elif GALLERY_REGEX.search(content['document_title']):
                         content['module-type'] = 'gallery'
 
                 # Clean up learn-more section
@@ -246,7 +295,7 @@ class ContentLoader(object):
 
                 # Clean up some snapshots with example write ups
                 full_write_up = content.get('full-write-up')
-                if full_write_up and re.search(r'In a page \(500 words\) or less', full_write_up):
+                if full_write_up and EXAMPLE_FULL_WRITE_UP_REGEX.search(full_write_up):
                     del content['full-write-up']
 
                 # Clean up some modules with example tags
@@ -275,6 +324,8 @@ class ContentLoader(object):
         As a final step, iterate through all modules, patch up module links
         and add bylines for simplicity
         '''
+        self.fuzzy_match_cache.clear()
+        self.title_view_cache.clear()
         log('filters: postprocessing merged docs')
 
         language_all = self.config['language-all']
@@ -286,24 +337,18 @@ class ContentLoader(object):
 
         people_by_slug = {c['slug']: c for c in all_content if c['type'] == 'person'}
         for content in all_content:
-            people_content = [people_by_slug[a] for a in content.get('authors', [])]
+            people_content = [(people_by_slug[a]['title'], people_by_slug[a]['translations']) for a in content.get('authors', [])]
             if people_content:
-                titles_by_lang = {lang: [p['translations'].get(lang, {}).get('title', p['title']) for p in people_content]
-                                  for lang in language_all}
-                for lang, titles in titles_by_lang.items():
-                    byline = list_formatters[lang](titles)
+                translations = content['translations']
+                for lang in language_all:
+                    if lang != language_default and lang not in translations: continue
+                    byline = list_formatters[lang]([tr.get(lang, {}).get('title', title) for title, tr in people_content])
                     if lang == language_default:
                         content['byline'] = byline
-                    elif lang in content['translations']:
-                        content['translations'][lang]['byline'] = byline
-
-        # This regex isn't pefect, but should work for 99% of our cases. The
-        # problem relates to detecting nested parens without a proper parser.
-        # This solution just swallows any ending with an extra close paren.
-        # Since the link text is fuzzy matched anyway, we don't need to reliably
-        # capture the full link text. However, if any module names end up with
-        # parens in their middles "Like (such as) this", this method will fail.
-        xref_matcher = re.compile(r'(?<!!)\[([^\]]*)\]\(((?!http)[^)]+)\)(?:\s*\))?').search
+                    else:
+                        translations[lang]['byline'] = byline
+
+        xref_iter, xref_finder = XREF_REGEX.finditer, XREF_REGEX.findall
         xref_format_strings = {
             **{lang: '(see: [{type}: {title}](/tool/{slug})' for lang in language_all},
             **{'link': '[{title}](/tool/{slug})'},
@@ -315,17 +360,25 @@ class ContentLoader(object):
         types = {lang: {T['one']: T.get(lang, T['one']) for T in self.config['types-tool']}
                  for lang in language_all}
 
+        see_also_links = {}
         def patch_links(text):
-            m, chunks = xref_matcher(text), []
-            while m:
-                link_text, module_name, _, end = *m.groups(), *m.span()
+            # Most strings contain no links at all, so skip the regex for them
+            if '](' not in text:
+                return text
+            chunks, start = [], 0
+            for m in xref_iter(text):
+                link_text, module_name = m.groups()
+                chunks.append(text[start:m.start()])
                 # TODO: ensure this gets the right language, even on a fresh load
-                content = self.find_content(module_name, all_content, thresh=90)
+                content = xref_matches.get(module_name)
+                if content is None:
+                    content = self.find_content(module_name, all_content, thresh=90)
                 # Module exists
                 if content:
                     if link_text:
                         replacement = xref_format_strings['link'].format(title=link_text, slug=content['slug'])
-                    else:
+                    # Generated link text only depends on the module and language, so it is built once
+                    elif (replacement := see_also_links.get((id(content), language))) is None:
                         if language == language_default:
                             link_text = nest_parens(content['title'], 1)
                         else:
@@ -336,25 +389,28 @@ class ContentLoader(object):
                                 link_text = nest_parens(content['title'], 1)
                         type_name = types[language][content['type']].upper()
                         replacement = xref_format_strings[language].format(type=type_name, title=link_text, slug=content['slug'])
-                    chunks.append(re.sub(re.escape(m.group()), replacement, text[:end]))
+                        see_also_links[id(content), language] = replacement
+                    chunks.append(replacement)
                 # No module, but there's link text
                 elif link_text:
-                    chunks.append(re.sub(re.escape(m.group()), link_text, text[:end]))
+                    chunks.append(link_text)
                 # No module, so remove markdown and leading spaces
                 else:
-                    chunks.append(re.sub(r'\s*' + re.escape(m.group()), '', text[:end]))
-                text = text[end:]
-                m = xref_matcher(text)
-            return ''.join(chunks) + text
-
-        # Recursive visitor reaches all deeply nested strings
-        visit_all = lambda x: {
-            list:   lambda L: [visit_all(i) for i in L],
-            tuple:  lambda t: [visit_all(i) for i in t],
-            dict:   lambda d: {k: visit_all(v) for k,v in d.items()},
-            str:    lambda s: patch_links(s),
-            int:    lambda i: i,
-        }[type(x)](x)
+                    chunks[-1] = chunks[-1].rstrip()
+                start = m.end()
+            chunks.append(text[start:])
+            return ''.join(chunks)
+
+        # Recursive visitor reaches all deeply nested strings (the most common case)
+        def visit_all(x):
+            t = type(x)
+            if t is str:
+                return patch_links(x)
+            if t is dict:
+                return {k: visit_all(v) for k,v in x.items()}
+            if t is list or t is tuple:
+                return [visit_all(i) for i in x]
+            return x
 
 
         # Create a mapping of titles to slugs
@@ -366,6 +422,37 @@ class ContentLoader(object):
                     slugs_by_title[c['title']] = content['slug']
         titles = slugs_by_title.keys()
 
+        # Recursive generator reaches all deeply nested strings
+        def strings(x):
+            if isinstance(x, str):
+                yield x
+            elif isinstance(x, (list, tuple, dict)):
+                for i in (x.values() if isinstance(x, dict) else x):
+                    yield from strings(i)
+
+        # Gather all xref and key-module names so each kind can be fuzzy matched in one batch
+        # Also remember which fields hold any link syntax, since only those need to be visited
+        xref_names, key_names, linked_fields = set(), set(), set()
+        for content in all_content:
+            for c in [content, *content['translations'].values()]:
+                for key_group in c.get('key-modules', {}).values():
+                    key_names.update(k[0] for k in key_group)
+                if NEW in c:
+                    for field in markdown_fields:
+                        for text in strings(c.get(field)):
+                            if '](' in text:
+                                xref_names.update(module_name for _, module_name in xref_finder(text))
+                                linked_fields.add((id(c), field))
+        xref_matches = {name: {} for name in xref_names}
+        xref_matches.update(self.find_content_batch(xref_names, all_content, thresh=90))
+        # Key-modules are usually copied titles, so only fuzzy match the inexact ones
+        titles_by_lower = {}
+        for title in titles:
+            titles_by_lower.setdefault(title.strip().lower(), title)
+        key_matches = {k: titles_by_lower[k.strip().lower()] for k in key_names if k.strip().lower() in titles_by_lower}
+        key_matches.update(self.find_fuzzy_batch(key_names - key_matches.keys(), titles, thresh=90))
+        key_slugs = {k: slugs_by_title.get(title, '') for k,title in key_matches.items()}
+
         # This final pass through all nested content patches up xrefs and key-modules
         tool_by_slug = {c['slug']: c for c in all_content}
 
@@ -375,12 +462,12 @@ class ContentLoader(object):
             if 'key-modules' in content:
                 for key_group in content['key-modules'].values():
                     for i, k in enumerate(key_group):
-                        key_group[i] = list(k[:2]) + [slugs_by_title.get(self.find_fuzzy(k[0], titles, thresh=90), '')]
+                        key_group[i] = list(k[:2]) + [key_slugs.get(k[0], '')]
             # Process xref links in markdown fields
             if NEW in content and language in language_all:
-                for field in self.config['markdown']:
-                    if content.get(field):
-                        content[field] = visit_all(content.get(field))
+                for field in markdown_fields:
+                    if (id(content), field) in linked_fields:
+                        content[field] = visit_all(content[field])
             # This should be the last time the NEW marker is needed
             content.pop(NEW, None)
 
@@ -390,14 +477,14 @@ class ContentLoader(object):
                     for key_group in c['key-modules'].values():
                         for i, k in enumerate(key_group):
                             # Replace english key module title with translated title if possible
-                            slug = slugs_by_title.get(self.find_fuzzy(k[0], titles, thresh=90), '')
+                            slug = key_slugs.get(k[0], '')
                             if slug:
                                 key_group[i] = [tool_by_slug[slug]['translations'].get(language, {'title': k[0]})['title'], k[1], slug]
                 # Process xref links in markdown fields
                 if NEW in c and language in language_all:
-                    for field in self.config['markdown']:
-                        if c.get(field):
-                            c[field] = visit_all(c.get(field))
+                    for field in markdown_fields:
+                        if (id(c), field) in linked_fields:
+                            c[field] = visit_all(c[field])
                 # This should be the last time the NEW marker is needed
                 # NOTE these remain in the translated pieces unless removed here
                 c.pop(NEW, None)
@@ -409,41 +496,84 @@ class ContentLoader(object):
         '''
         General-purpose fuzzy matcher
         '''
-        match = extractOne(title, title_list)
+        match = extractOne(title, title_list, scorer=WRatio, processor=default_process, score_cutoff=thresh)
         if match and match[1] >= thresh:
             return match[0]
 
 
-    def find_content(self, item_name, item_list, thresh=50, fuzzy_match_cache={}, rename_cache=set()):
+    def find_fuzzy_batch(self, titles, title_list, thresh=50):
+        '''
+        Batch version of find_fuzzy which scores all titles against title_list at
+        once, returning a dict of each matched title to its match
+        '''
+        titles, title_list = [*{*titles}], [*title_list]
+        if not titles or not title_list:
+            return {}
+        scores = cdist(titles, title_list, scorer=WRatio, processor=default_process, score_cutoff=thresh, workers=-1)
+        best = scores.argmax(axis=1)
+        return {t: title_list[j] for t, j, row in zip(titles, best, scores) if row[j] >= thresh}
+
+
+    def find_content_batch(self, item_names, item_list, thresh=50):
+        '''
+        Batch version of find_content, returning a dict of each matched item name
+        to its content item
+        '''
+        item_names = {n for n in item_names if isinstance(n, str)}
+
+        # First determine which item_names refer to modules which have been renamed
+        renamed = self.config['renamed-modules']
+        renamed_matches = self.find_fuzzy_batch(item_names, renamed.keys(), 90)
+        for item_name, match in renamed_matches.items():
+            if item_name not in self.rename_cache:
+                self.rename_cache.add(item_name)
+                log(f'renamed: reference changed from "{item_name}" to "{renamed[match]}"')
+        targets = {n: renamed[renamed_matches[n]] if n in renamed_matches else n for n in item_names}
+
+        # Perform the actual match, preferring the first item when titles are duplicated
+        # and only fuzzy matching the targets which aren't exact titles
+        items_by_title = {}
+        for item in item_list:
+            items_by_title.setdefault(item.get('title', ''), item)
+        matches = {t: t for t in targets.values() if t in items_by_title}
+        matches.update(self.find_fuzzy_batch({*targets.values()} - matches.keys(), items_by_title, thresh))
+        return {n: items_by_title[matches[t]] for n, t in targets.items() if t in matches}
+
+
+    def find_content(self, item_name, item_list, thresh=50):
         '''
         Use fuzzy matching to find a content item from a list
         This should always return a dict
 
-        XXX: If item_list has changed since the last time it was cached, this function
-             can return an item which is no longer in item_list. A source of strange bugs.
+        Results and preprocessed titles are cached by item_list identity, so callers
+        must clear self.fuzzy_match_cache and self.title_view_cache before item
+        lists may be changed or replaced.
         '''
         if not isinstance(item_name, str):
             return {}
 
-        cached = fuzzy_match_cache.setdefault((id(item_list), len(item_list)), {}).get(item_name)
-        if cached:
+        key = id(item_list), item_name, thresh
+        cached = self.fuzzy_match_cache.get(key)
+        if cached is not None:
             return cached
 
         # First determine whether the item_name refers to a module which has been renamed
-        renamed = self.config['renamed-modules']
-        match = extractOne(item_name, renamed.keys())
+        query = default_process(item_name)
+        match = extractOne(query, self.renamed_titles, scorer=WRatio, processor=None, score_cutoff=90)
         if match and match[1] >= 90:
-            if item_name not in rename_cache:
-                rename_cache.add(item_name)
-                log(f'renamed: reference changed from "{item_name}" to "{renamed[match[0]]}"')
-            item_name = renamed[match[0]]
+            target_name = self.renamed_targets[match[2]]
+            if item_name not in self.rename_cache:
+                self.rename_cache.add(item_name)
+                log(f'renamed: reference changed from "{item_name}" to "{target_name}"')
+            query = default_process(target_name)
 
-        # Perform the actual match
-        match = extractOne({'title': item_name}, item_list, processor=lambda i: i.get('title', ''))
-        if match and match[1] >= thresh:
-            fuzzy_match_cache[id(item_list), len(item_list)][item_name] = match[0]
-            return match[0]
-        return {}
+        # Perform the actual match against titles which are only preprocessed once per item_list
+        titles = self.title_view_cache.get(id(item_list))
+        if titles is None:
+            titles = self.title_view_cache[id(item_list)] = [default_process(i.get('title', '')) for i in item_list]
+        match = extractOne(query, titles, scorer=WRatio, processor=None, score_cutoff=thresh)
+        self.fuzzy_match_cache[key] = item_list[match[2]] if match and match[1] >= thresh else {}
+        return self.fuzzy_match_cache[key]
 
 
     def db_get_or_create(self):
@@ -451,27 +581,59 @@ class ContentLoader(object):
         Get the database, creating if necessary
         '''
         self.db = self.couch[DB_NAME] if DB_NAME in self.couch else self.couch.create(DB_NAME)
+        self.all_docs_cache = None
         return self.db
 
 
+    def db_all_docs(self):
+        '''
+        Get all docs in the database, fetching them at most once between saves
+        '''
+        if self.all_docs_cache is None:
+            self.all_docs_cache = [row.doc for row in self.db.view('_all_docs', include_docs=True)]
+        return self.all_docs_cache
+
+
     def db_save(self, doc_or_docs):
         '''
         Write one or many dicts (docs) to couchdb
         '''
         if not doc_or_docs: return
+        self.all_docs_cache = None
         # Handle one or many docs
         docs = [doc_or_docs] if isinstance(doc_or_docs, dict) else doc_or_docs
 
         log(f'db: storing {len(docs)} doc(s)')
         # Remove couch-disallowed keys and add _id where needed
         docs = [{k:v for k,v in d.items() if k in ('_id', '_rev') or not k.startswith('_')} for d in docs]
-        [d.update(_id='{type}:{slug}'.format(**d)) for d in docs if '_id' not in d]
-        # Simple conflict resolution (WARNING: this won't work with replication!)
-        for success,id,rev_or_exc in self.db.update(docs):
-            if isinstance(rev_or_exc, couchdb.http.ResourceConflict):
-                retry = [d for d in docs if d['_id'] == id][0]
-                retry.update(_rev=self.db[id]['_rev'])
-                self.db.save(retry)
+        for d in docs:
+            if '_id' not in d:
+                d['_id'] = f"{d['type']}:{d['slug']}"
+        docs_by_id = {d['_id']: d for d in docs}
+
+        def save_chunk(chunk):
+            # Simple conflict resolution (WARNING: this won't work with replication!)
+            conflicts = [id for success,id,rev_or_exc in self.db.update(chunk)
+                         if isinstance(rev_or_exc, couchdb.http.ResourceConflict)]
+            if conflicts:
+                # Get all current revisions in one request and retry in bulk
+                for row in self.db.view('_all_docs', keys=conflicts):
+                    if row.get('value'):
+                        docs_by_id[row.id]['_rev'] = row.value['rev']
+                failures = [(id, exc) for success,id,exc in self.db.update([docs_by_id[id] for id in conflicts])
+                            if not success]
+                for id,exc in failures:
+                    log(f'db: failed to store {id} after retry: {exc!r}')
+                if failures:
+                    raise failures[0][1]
+
+        chunks = [docs[i:i + DB_SAVE_CHUNK_SIZE] for i in range(0, len(docs), DB_SAVE_CHUNK_SIZE)]
+        if len(chunks) == 1:
+            save_chunk(chunks[0])
+        else:
+            # The couchdb session's connection pool is thread-safe, so chunks can be in flight together
+            with concurrent.futures.ThreadPoolExecutor(max_workers=DB_SAVE_WORKERS) as executor:
+                list(executor.map(save_chunk, chunks))
 
 
     def configure(self):
@@ -494,12 +656,15 @@ class ContentLoader(object):
         c.setdefault('language-detection-weighted-keys', [])
         # How we distinguish published content
         c.setdefault('published-filename-regex', r'\bDONE\b')
+        self.published_regex = re.compile(c['published-filename-regex'])
         # Ignore folders
         c.setdefault('ignore-folder-regex', r'^$')
+        self.ignore_folder_regex = re.compile(c['ignore-folder-regex'])
         # Renaming synonymous keys, including those with language-suffixes
         c.setdefault('synonyms', {})
         # Manage single keys which contain lists
         c.setdefault('plural-separator-regex', r'(?:\s*,|\s+and|\s+&)\s+')
+        self.plural_separator_regex = re.compile(c['plural-separator-regex'])
         c.setdefault('plural-keys', {})
         # Fields which should be parsed with markdown parser
         c.setdefault('markdown', [])
@@ -526,6 +691,9 @@ class ContentLoader(object):
                 c['relationships']['backward'].append(value)
         # Document renaming
         c['renamed-modules'] = {d['old']: d['new'] for d in c.get('renamed-modules', [])}
+        # Old names are preprocessed once for fuzzy matching in find_content
+        self.renamed_titles = [default_process(old) for old in c['renamed-modules']]
+        self.renamed_targets = [*c['renamed-modules'].values()]
 
         # Save the config before creating lots of temporary language-related data within it
         c.update(type='config', slug='api')
@@ -534,9 +702,11 @@ class ContentLoader(object):
 
         # Key transformations have to take into account language suffixes, so this adds suffixed copies
         # of synonyms and plural-keys
-        add_language_suffixes = lambda D: [D.update(each) for each in
-            [{k+'-'+lang: [i+'-'+lang for i in v] if isinstance(v, list) else
-                          v+'-'+lang for k,v in D.items()} for lang in self.config['language-all']] ]
+        def add_language_suffixes(D):
+            items = list(D.items())
+            for lang in self.config['language-all']:
+                for k,v in items:
+                    D[k+'-'+lang] = [i+'-'+lang for i in v] if isinstance(v, list) else v+'-'+lang
         add_language_suffixes(c['synonyms'])
         add_language_suffixes(c['plural-keys'])
 
@@ -589,9 +759,10 @@ class ContentLoader(object):
         # Get all documents
         else:
             # Recursive folder getter requires python3.3+ for "yield from"
+            ignored = self.ignore_folder_regex.search
             def get_folders(root):
                 for folder in root.folders:
-                    if re.search(self.config['ignore-folder-regex'], folder.title):
+                    if ignored(folder.title):
                         log(f'omit: by ignore-folder-regex "{folder.title}"')
                         continue
                     yield folder
@@ -602,22 +773,52 @@ class ContentLoader(object):
         return documents
 
 
-    def extract_and_transform(self, document):
+    @staticmethod
+    def transform_chunk(transform, chunk):
         '''
-        Process a document and return a content item.
+        Apply transform to a chunk of detached documents in a worker process
+        '''
+        return [transform(attributes) for attributes in chunk]
+
+
+    def transform_in_processes(self, transform, documents):
         '''
+        Apply transform to detached documents in worker processes, in order,
+        keeping only a bounded window of chunks in flight so memory stays flat
+        '''
+        chunks = iter(lambda: list(itertools.islice(documents, PARSE_CHUNK_SIZE)), [])
+        # Fork explicitly: spawned workers would re-import the contentloader
+        # script, which runs its jobs and waits on the lock this process holds
+        context = multiprocessing.get_context('fork')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context) as executor:
+            window = collections.deque()
+            for chunk in chunks:
+                window.append(executor.submit(self.transform_chunk, transform, chunk))
+                if len(window) >= 2 * PARSE_WORKERS:
+                    yield from window.popleft().result()
+            while window:
+                yield from window.popleft().result()
+
+
+    @staticmethod
+    def extract_and_transform(config, plural_separator_regex, attributes):
+        '''
+        Process a detached document's attributes and return a content item.
+        The compiled plural-separator-regex is passed along with the config.
+        '''
+        document = PhonyDriveFileWithText(..., attributes)
         content = parse_archieml(document.text)
         content[NEW] = True
 
         # Rename synonymous keys (this should happen before all other transformations)
-        for old_key,new_key in self.config['synonyms'].items():
+        for old_key,new_key in config['synonyms'].items():
             old_value = content.get(old_key)
             if old_value is not None:
                 content[new_key] = old_value
                 del content[old_key]
 
         # Determine the type
-        type = next((T for T in self.config['types'] if T['one'] in content), {}).get('one', '')
+        type = next((T for T in config['types'] if T['one'] in content), {}).get('one', '')
         content['type'] = type
         content['title'] = title = content.get(type)
         if not isinstance(title, str): 
@@ -636,16 +837,16 @@ class ContentLoader(object):
         content['timestamp'] = int(1000 * dt.timestamp())
 
         # Convert singular keys to plural keys and split them up as lists
-        for plural_key,singular_key in self.config['plural-keys'].items():
+        for plural_key,singular_key in config['plural-keys'].items():
             single, plural = content.get(singular_key), content.get(plural_key)
             if single:
                 content[plural_key] = [single]
                 if plural_key != singular_key:
                     del content[singular_key]
             if plural and not isinstance(plural, list):
-                multiline = re.split(r'\s*\n\s*\n\s*', plural)
+                multiline = MULTILINE_REGEX.split(plural)
                 content[plural_key] = (multiline if len(multiline) > 1 else 
-                                       re.split(self.config['plural-separator-regex'], plural))
+                                       plural_separator_regex.split(plural))
 
         log(f"extract: {document.id} ({type}: {content['title']})")
         return content
@@ -670,31 +871,65 @@ class ContentLoader(object):
                         'document_id', 'document_link', 'document_title'}
 
         # Matches http/s, emails and 3-character-suffixed filenames
-        an_obvious_computer_thing = re.compile(r'(http|[^\s]+(\.[a-z]{3}|@[^\s]+)$)').match
-        # This recursive function concatenates text from nested structures
-        r_concat = lambda x: {
-            list:   lambda L: '\n'.join(map(r_concat, L)),
-            dict:   lambda d: '\n'.join(map(r_concat, d.values())),
-            str:    lambda s: '' if an_obvious_computer_thing(s) else s
-        }.get(type(x), str)(x)
+        has_whitespace, has_computer_suffix = WHITESPACE_REGEX.search, COMPUTER_THING_SUFFIX_REGEX.search
+        an_obvious_computer_thing = lambda s: s.startswith('http') or not has_whitespace(s) and has_computer_suffix(s)
+        # This function concatenates text from nested structures into a single buffer
+        def r_concat(x):
+            text, stack = [], [x]
+            while stack:
+                v = stack.pop()
+                t = type(v)
+                if t is str:
+                    if not an_obvious_computer_thing(v):
+                        text.append(v)
+                elif t is list:
+                    stack.extend(reversed(v))
+                elif t is dict:
+                    stack.extend(reversed(v.values()))
+                else:
+                    text.append(str(v))
+            return '\n'.join(text)
 
+        # Gather every corpus first so the model runs once over the whole batch
+        undetected, corpora, weighted = [], [], []
         for content in all_content:
             if 'lang' not in content:
-                text_items = {k: r_concat(v) for k,v in content.items()
-                              if k[-3:] not in language_suffixes and k not in omitted_keys}
-
-                corpus = ' '.join(text_items.values()).replace('\n', ' ')
-                corpus_weighted = ' '.join(v for k,v in text_items.items() 
-                                           if k in weighted_keys).replace('\n', ' ')
+                # Build both corpora in a single pass over the relevant keys
+                parts, parts_weighted = [], []
+                for k,v in content.items():
+                    if k[-3:] not in language_suffixes and k not in omitted_keys:
+                        text = r_concat(v).replace('\n', ' ')
+                        parts.append(text)
+                        if k in weighted_keys:
+                            parts_weighted.append(text)
+                corpus = ' '.join(parts)
+                corpus_weighted = ' '.join(parts_weighted)
+
+                # Don't bother the model with text which carries no linguistic signal
+                letters = corpus.replace(' ', '')
+                if len(letters) < 4 or letters.isdigit():
+                    content['lang'] = language_default
+                    log(f"""language: defaulted to {content['lang']} for "{content['title']}" """)
+                    continue
+
+                undetected.append(content)
+                corpora.append(corpus)
+                if len(corpus_weighted) > 20:
+                    weighted.append((len(undetected) - 1, corpus_weighted))
 
-                guess = ftlangdetect.detect(corpus)
-                content['lang'] = guess['lang']
+        if not undetected:
+            return all_content
 
-                if len(corpus_weighted) > 20:
-                    guess_weighted = ftlangdetect.detect(corpus_weighted)
-                    content['lang'] = max(guess, guess_weighted, key=lambda g: g['score'])['lang']
+        model = load_language_model()
+        guesses = [(label[0].replace('__label__', ''), score[0]) for label, score in zip(*model.predict(corpora, k=1))]
+        if weighted:
+            labels, scores = model.predict([corpus for i,corpus in weighted], k=1)
+            for (i, corpus), label, score in zip(weighted, labels, scores):
+                guesses[i] = max(guesses[i], (label[0].replace('__label__', ''), score[0]), key=lambda g: g[1])
 
-                log(f"""language: guessed {content['lang']} for "{content['title']}" """)
+        for content, (lang, score) in zip(undetected, guesses):
+            content['lang'] = lang
+            log(f"""language: guessed {content['lang']} for "{content['title']}" """)
 
         return all_content
 
@@ -704,13 +939,19 @@ class ContentLoader(object):
         Assuming all necessary documents have already been fetched, merge translations
         into the content object for the default language. They will be placed into a 
         'translations' dictionary under two-letter language code keys.
+
+        Returns the merged content along with indexes of it by type and by type and slug.
         '''
+        self.fuzzy_match_cache.clear()
+        self.title_view_cache.clear()
         language_all = self.config['language-all']
         language_default = self.config['language-default']
-        language_other = set(language_all) - set(language_default)
+        language_other = set(language_all) - {language_default}
+        language_suffixes = {f'-{lang}': lang for lang in language_all}
         #language_omit = self.config['language-omit']
         content_primary = []
         content_primary_by_type = {}
+        content_primary_by_type_and_slug = {}
         content_translated = []
 
         # Sort content by language
@@ -718,12 +959,23 @@ class ContentLoader(object):
             if content['lang'] == language_default:
                 content_primary.append(content)
                 content_primary_by_type.setdefault(content['type'], []).append(content)
+                content_primary_by_type_and_slug.setdefault(content['type'], {})[content['slug']] = content
             else:
                 content_translated.append(content)
 
+        # Match all default language titles for each type in one batch
+        default_names_by_type = {}
+        for translation in content_translated:
+            names = default_names_by_type.setdefault(translation['type'], set())
+            if isinstance(name := translation.get('default-language-content', ''), str):
+                names.add(name)
+        defaults_by_type = {T: self.find_content_batch(names, content_primary_by_type[T], thresh=90)
+                            for T, names in default_names_by_type.items()}
+
         # Add translated content to a translations dict in each default language piece
         for translation in content_translated:
-            default = self.find_content(translation.get('default-language-content', ''), content_primary_by_type[translation['type']], thresh=90)
+            name = translation.get('default-language-content', '')
+            default = defaults_by_type[translation['type']].get(name) if isinstance(name, str) else None
             if not default:
                 warn(f"skip: {translation.get('title')} can't find default language version {translation.get('default-language-content')}")
                 continue
@@ -731,67 +983,93 @@ class ContentLoader(object):
             translations[translation['lang']] = translation
             log(f"merge: {translation['title']} ({translation['lang']}) => {default['title']}")
 
-        # Recursive in-place dictionary merging function to be used on COPIES of destination dicts
-        def merge_dicts(dest, src):
-            for k, v in src.items():
-                if isinstance(dest.get(k), dict) and isinstance(v, dict):
-                    merge_dicts(dest[k], v)
-                else:
-                    dest[k] = v
+        # Dictionary merging function which returns a deep copy of dest with src merged into it,
+        # without copying the subtrees of dest which src replaces anyway. Nested dicts to merge
+        # are handled with a stack, their empty results being inserted first to keep key order.
+        # Content is plain JSON data, so an orjson round trip is a much cheaper deep copy.
+        def merged_copy(dest, src):
+            merged = {}
+            stack = [(merged, dest, src)]
+            while stack:
+                out, d, s = stack.pop()
+                for k, v in d.items():
+                    if k not in s:
+                        out[k] = orjson.loads(orjson.dumps(v)) if isinstance(v, (dict, list)) else v
+                    elif isinstance(v, dict) and isinstance(s[k], dict):
+                        out[k] = {}
+                        stack.append((out[k], v, s[k]))
+                    else:
+                        out[k] = s[k]
+                for k, v in s.items():
+                    out.setdefault(k, v)
+            return merged
 
         # Look through primary language documents and integrate keys with language code suffixes (-es, -fr)
         for content in content_primary:
             content.setdefault('translations', {})
+            # Bucket keys by their language suffix in a single pass
+            keys_by_language = {}
+            for k in content:
+                if isinstance(k, str) and (lang := language_suffixes.get(k[-3:])):
+                    keys_by_language.setdefault(lang, []).append(k)
             # Merge the default language first, simply replacing objects without merging subkeys
-            default_language_keys = [k for k in content if isinstance(k, str) and k.endswith('-' + language_default)]
+            default_language_keys = keys_by_language.get(language_default, [])
             content.update({k[:-3]: content[k] for k in default_language_keys if content[k]})
-            [content.pop(k) for k in default_language_keys]
+            for k in default_language_keys:
+                content.pop(k)
             # Merge the remaining languages into the default language
             for lang in language_other:
                 # Get inline translations to be merged and remove them from the content object
-                language_keys = [k for k in content if isinstance(k, str) and k.endswith('-' + lang)]
+                language_keys = keys_by_language.get(lang, [])
                 language_new = {k[:-3]: content[k] for k in language_keys if content[k]}
-                [content.pop(k) for k in language_keys]
+                for k in language_keys:
+                    content.pop(k)
                 if language_new:
                     # Get any existing translations and update the simple keys
                     language_dict = content['translations'].setdefault(lang, {})
                     language_dict.update(language_new)
-                    # Copy dicts from the original content, merge translations into them, then update the existing translations
-                    default_language_dicts_to_merge_into = {k: deepcopy(content[k]) for k,v in language_new.items()
-                                                            if isinstance(content.get(k), dict)}
-                    [merge_dicts(v, language_new[k]) for k,v in default_language_dicts_to_merge_into.items()]
-                    language_dict.update(default_language_dicts_to_merge_into)
+                    # Copy dicts from the original content with translations merged in, then update the existing translations
+                    language_dict.update({k: merged_copy(content[k], v) for k,v in language_new.items()
+                                          if isinstance(content.get(k), dict) and isinstance(v, dict)})
 
         # TODO: language-omit (currently performed by API server)
 
         # All content is now in this merged list
-        return content_primary
+        return content_primary, content_primary_by_type, content_primary_by_type_and_slug
 
 
-    def fix_relationships(self, all_content):
+    def fix_relationships(self, all_content, typed_content, typed_slugged_content):
         '''
-        Replace relationships based on document titles with fuzzy-matched slugs
+        Replace relationships based on document titles with fuzzy-matched slugs, using
+        the indexes of all_content by type and by type and slug from merge_translations
         '''
-        typed_content = {}
-        typed_slugged_content = {}
-        for content in all_content:
-            typed_content.setdefault(content['type'], []).append(content)
-            typed_slugged_content.setdefault(content['type'], {})[content['slug']] = content
+        self.fuzzy_match_cache.clear()
+        self.title_view_cache.clear()
 
         # Forward relationships are specified with a mapping of fields to types. This is a time-consuming
         # but important process. Each entry is written by hand and so must be fuzzy matched for spelling
         # errors and non-existent related documents.
         for field, T in self.config['relationships']['forward'].items():
             possibly_related_docs = all_content if T == 'any' else typed_content.get(T, [])
+            # Match every title used in this field in one batch
+            related_names = set()
+            for content in all_content:
+                related_titles = content.get(field)
+                if isinstance(related_titles, list):
+                    related_names.update(t for t in related_titles if isinstance(t, str))
+                elif isinstance(related_titles, str):
+                    related_names.add(related_titles)
+            related_matches = self.find_content_batch(related_names, possibly_related_docs, thresh=90)
+
             for content in all_content:
                 related_titles = content.get(field)
                 if related_titles is not None:
                     if isinstance(related_titles, list):
-                        related_docs = (self.find_content(t, possibly_related_docs, 90) for t in related_titles)
+                        related_docs = (related_matches.get(t) for t in related_titles if isinstance(t, str))
                         # Ignore leading hyphens when sorting (Is this sort redundant? Prove it before removing!)
                         content[field] = sorted((c['slug'] for c in related_docs if c), key=lambda s: s.lstrip('-'))
                     elif isinstance(related_titles, str):
-                        content[field] = self.find_content(related_titles, possibly_related_docs, 90).get('slug')
+                        content[field] = related_matches.get(related_titles, {}).get('slug')
                     if not content[field]:
                         del content[field]
 
@@ -822,7 +1100,10 @@ class ContentLoader(object):
                     if isinstance(related_slugs, str):
                         related_slugs = [related_slugs]
                     if isinstance(related_slugs, list):
-                        related_slugs = [*filter(None, (typed_slugged_content.get(T, {}).get(s) for s in related_slugs))]
+                        slugged_content = typed_slugged_content.get(T)
+                        if not slugged_content:
+                            continue # No content of this type to relate to
+                        related_slugs = [*filter(None, map(slugged_content.get, related_slugs))]
                     related_docs.extend(related_slugs)
 
                 # Populate each forward-related doc's appropriate related_name with this doc's
@@ -861,7 +1142,7 @@ class ContentLoader(object):
         asset_path_rel = self.config['asset-path'].lstrip('/')
 
         for e in content.get('real-world-examples', []):
-            if 'image' not in e or re.match('rwe_[a-f0-9]{32}_', e['image']):
+            if 'image' not in e or RWE_IMAGE_REGEX.match(e['image']):
                 hash = md5(e['link'].encode()).hexdigest()
                 slug = slugify(e['title'])
                 # Note: updating the RWE in-place requires saving to db
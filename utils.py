@@ -10,11 +10,12 @@ import os
 import re
 import sys
 import time
-from functools import reduce, wraps
+from functools import lru_cache, reduce, wraps
 from subprocess import Popen
 
 import archieml
 archieml.OrderedDict = dict
+import ijson
 import magic
 import unidecode
 import driveclient
@@ -31,6 +32,9 @@ ARABIC_RANGES = r'\u0600-\u06ff\u0750-\u077f\ufb50-\ufbc1\ufbd3-\ufd3f'\
                 r'\ufd49-\ufd8f\ufd92-\ufdc7\ufe70-\ufefc\ufdf0-\ufdfd'
 ARABIC_BOUNDARY_REGEX = r'(?:(?<=[^\w{0}])(?=[\w{0}])|(?<=[\w{0}])(?=[^\w{0}]))'.format(ARABIC_RANGES)
 
+# Google's [a][b][c] comment annotations, whole lines and inline markers in one pass
+COMMENT_REGEX = re.compile(r'^\[[a-z]\].+$|\[[a-z]\]', re.M)
+
 
 class PhonyDriveFileWithText(driveclient.DriveFile):
     '''
@@ -60,6 +64,16 @@ def driveclient_document_json_decoder(dct):
     return dct
 
 
+def driveclient_document_json_stream(filename):
+    '''
+    Incrementally decode a json list of documents saved using the
+    driveclient_document_json_encoder, yielding one document at a time
+    '''
+    with open(filename, 'rb') as f:
+        for obj in ijson.items(f, 'item', use_float=True):
+            yield driveclient_document_json_decoder(obj)
+
+
 @contextlib.contextmanager
 def script_directory():
     '''
@@ -136,8 +150,7 @@ def parse_archieml(text):
     '''
     text = text.replace('\r', '')
     # Obliterate ALL of google's [a][b][c] comment annotations!
-    text = re.sub(r'^\[[a-z]\].+$', '', text, flags=re.M)
-    text = re.sub(r'\[[a-z]\]', '', text)
+    text = COMMENT_REGEX.sub('', text)
     # Undo some of the auto-capitalization google docs inflicts
     return {k.lower(): v for k,v in archieml.loads(text).items() if v and isinstance(k, str)}
 
@@ -156,6 +169,7 @@ def mimetype(filename):
     return magic.from_file(filename, mime=True).decode()
 
 
+@lru_cache(maxsize=8192)
 def slugify(s, allow=''):
     '''
     Reproduce these steps for consistent slugs!
@@ -208,14 +222,17 @@ def timecalls(f):
     return wrapper
 
 
-def log(*s, fatal=False, tty=sys.stdout.isatty(), color='green', **kw):
+# Support foreground colors specified by name or ANSI escape number
+LOG_COLORS = dict(zip('red green yellow blue magenta cyan white'.split(), range(31,38)))
+LOG_COLORS.update({str(v):v for k,v in LOG_COLORS.items()})
+LOG_FILE_NAME = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'log.txt')
+
+
+def log(*s, fatal=False, tty=sys.stdout.isatty(), color='green', files={}, **kw):
     '''
     Tee-style logging with timestamps
     '''
-    # Support foreground colors specified by name or ANSI escape number
-    colors = dict(zip('red green yellow blue magenta cyan white'.split(), range(31,38)))
-    colors.update({str(v):v for k,v in colors.items()})
-    color = colors[str(color).lower()]
+    color = LOG_COLORS[str(color).lower()]
 
     # Select color or plain logging depending on terminal type
     logfmt = (f'\x1b[30m[\x1b[{color}m{{:^10}}\x1b[30m]\x1b[0m' if tty else '[{:^10}]').format
@@ -226,10 +243,17 @@ def log(*s, fatal=False, tty=sys.stdout.isatty(), color='green', **kw):
         s = [logfmt(head), tail, *s[1:]]
     s = ' '.join(map(str, s))
 
-    # Log to file
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    with open(os.path.join(script_dir, 'log.txt'), 'a', encoding="utf-8") as file:
-        file.write(f'{datetime.datetime.utcnow().isoformat()} {s}\n')
+    # Log to file (kept open and line buffered, but reopened if log.txt is rotated or deleted)
+    f = files.get(LOG_FILE_NAME)
+    try:
+        current = f is not None and os.path.samestat(os.stat(LOG_FILE_NAME), os.fstat(f.fileno()))
+    except FileNotFoundError:
+        current = False
+    if not current:
+        if f:
+            f.close()
+        files[LOG_FILE_NAME] = f = open(LOG_FILE_NAME, 'a', buffering=1, encoding="utf-8")
+    f.write(f'{datetime.datetime.utcnow().isoformat()} {s}\n')
 
     # Log to terminal
     print(s, **kw)
@@ -253,6 +277,7 @@ __all__ = [
     'PhonyDriveFileWithText',
     'driveclient_document_json_encoder',
     'driveclient_document_json_decoder',
+    'driveclient_document_json_stream',
     'script_directory', 
     'script_subdirectory', 
     'only_one_process',